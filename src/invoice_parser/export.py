@@ -0,0 +1,167 @@
+import abc
+import csv
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Dict, Iterable, List, Type
+from xml.sax.saxutils import XMLGenerator
+
+from invoice_index import file_digest
+
+EXPORTABLE_STATUSES = {'success'}
+MANIFEST_FILENAME = 'manifest.json'
+
+def is_exportable(invoice) -> bool:
+    """ True for invoices that could be entered, i.e. parsed with a work order and not yet done """
+    return invoice.status in EXPORTABLE_STATUSES and bool(invoice.workorder)
+
+class BulkExporter(abc.ABC):
+    """ Abstract class for writing invoices to a bulk import file one at a time.
+
+        The fields are the same ones 'controller.enter_invoice' types in.
+    """
+    suffix = ''
+
+    def __init__(self, f: IO[str]):
+        self.f = f
+
+    def begin(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def write(self, invoice) -> None: return
+
+    def end(self) -> None:
+        pass
+
+    @staticmethod
+    def fields(invoice) -> Dict[str, str]:
+        return {
+            'date': f'{invoice.timestamp:%d%m%y}',
+            'number': str(invoice.number),
+            'amount': str(invoice.amount).replace('.', ','),
+            'workorder': str(invoice.workorder)
+        }
+
+class CsvExporter(BulkExporter):
+    suffix = '.csv'
+    headings = ['date', 'number', 'amount', 'workorder']
+
+    def begin(self):
+        self.writer = csv.DictWriter(self.f, fieldnames=self.headings, delimiter=';', lineterminator='\n')
+        self.writer.writeheader()
+
+    def write(self, invoice):
+        self.writer.writerow(self.fields(invoice))
+
+class XmlExporter(BulkExporter):
+    suffix = '.xml'
+
+    def begin(self):
+        self.xml = XMLGenerator(self.f, encoding='utf-8')
+        self.xml.startDocument()
+        self.xml.startElement('invoices', {})
+
+    def write(self, invoice):
+        self.xml.startElement('invoice', {})
+        for name, value in self.fields(invoice).items():
+            self.xml.startElement(name, {})
+            self.xml.characters(value)
+            self.xml.endElement(name)
+        self.xml.endElement('invoice')
+
+    def end(self):
+        self.xml.endElement('invoices')
+        self.xml.endDocument()
+
+exporters: Dict[str, Type[BulkExporter]] = {
+    'csv': CsvExporter,
+    'xml': XmlExporter
+}
+
+def exporter_for(filename, format: str = None) -> Type[BulkExporter]:
+    """ Returns the exporter for format, or for the file suffix if not given """
+    format = format or Path(filename).suffix.lstrip('.').lower()
+    if format not in exporters:
+        raise ValueError(f"Unknown export format '{format}', expected one of: {', '.join(exporters)}")
+    return exporters[format]
+
+def export_invoices(invoices: Iterable, filename, format: str = None, archive=None) -> int:
+    """ Streams invoices to a bulk import file and returns the number written.
+
+        The format is taken from the file suffix unless given. New formats can
+        be added to 'exporters'. If 'archive' is given the PDFs are archived
+        there as well. The file is written next to the target and only renamed
+        into place once everything succeeded, so a failed export never leaves
+        a file behind to be imported.
+    """
+    filename = Path(filename)
+    exporter_class = exporter_for(filename, format)
+    invoices = list(invoices)
+
+    count = 0
+    tmp_file = filename.with_name(filename.name + '.tmp')
+    try:
+        with open(tmp_file, 'w', encoding='utf-8', newline='') as f:
+            exporter = exporter_class(f)
+            exporter.begin()
+            for invoice in invoices:
+                exporter.write(invoice)
+                count += 1
+            exporter.end()
+
+        if archive is not None:
+            archive_invoices(invoices, archive, tmp_file, export_name=filename.name)
+
+        os.replace(tmp_file, filename)
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
+
+    return count
+
+def _archive_file(source: Path, folder: Path) -> Dict:
+    target = folder / source.name
+    shutil.copyfile(source, target)
+    return {'name': target.name, 'size': target.stat().st_size, 'sha256': file_digest(target)}
+
+def archive_invoices(invoices: Iterable, folder, export_file=None, export_name: str = None, workers: int = 4) -> Path:
+    """ Copies the invoice PDFs into folder and writes a manifest of their
+        checksums. 'export_name' is the name recorded for 'export_file' if it
+        is still under a temporary name.
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        files = list(pool.map(lambda inv: _archive_file(Path(inv.link), folder), invoices))
+
+    manifest = {'files': files}
+    if export_file is not None:
+        manifest['export'] = {'name': export_name or Path(export_file).name, 'sha256': file_digest(export_file)}
+
+    manifest_file = folder / MANIFEST_FILENAME
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest_file
+
+def verify_manifest(folder, export_file=None) -> List[str]:
+    """ Returns the names of files that are missing or don't match the manifest """
+    folder = Path(folder)
+    with open(folder / MANIFEST_FILENAME, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    failed = []
+    for entry in manifest['files']:
+        path = folder / entry['name']
+        if not path.exists() or file_digest(path) != entry['sha256']:
+            failed.append(entry['name'])
+
+    if export_file is not None and 'export' in manifest:
+        if not Path(export_file).exists() or file_digest(export_file) != manifest['export']['sha256']:
+            failed.append(manifest['export']['name'])
+
+    return failed
@@ -1,11 +1,17 @@
 import ctypes
 import tkinter as tk
 import tkinter.filedialog as fd
+import tkinter.messagebox as mb
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import replace
 from pathlib import Path
 from tkinter import ttk
-from typing import Optional
+from typing import List, Optional
 
 import controller
+import export
+import invoice_index
+import journal
 import pdf_reader
 from item_treeview import InvoiceTree
 from pdf_viewer import PdfViewer
@@ -19,11 +25,17 @@ class Event:
     ON_REGISTER_ERROR = '<<ON_REGISTER_ERROR>>'
     ON_REGISTER_MISSING = '<<ON_REGISTER_MISSING>>'
     ON_UPLOAD_INVOICE = '<<ON_UPLOAD_INVOICE>>'
+    ON_EXPORT_INVOICES = '<<ON_EXPORT_INVOICES>>'
+    ON_EXPORT_ALL_INVOICES = '<<ON_EXPORT_ALL_INVOICES>>'
+
+JOURNAL_FLUSH_DELAY = 1000
+EXPORT_POLL_DELAY = 100
 
 class InvoiceOverview(ttk.Frame):
     def __init__(self, master, *args, **kwargs):
         super().__init__(master, *args, **kwargs)
         self.var_search_query = tk.StringVar()
+        self.var_grouped = tk.BooleanVar(value=False)
 
         f_buttons = ttk.Frame(self)
         f_buttons.pack(side='top', fill='x')
@@ -31,6 +43,9 @@ class InvoiceOverview(ttk.Frame):
         ttk.Entry(f_buttons, textvariable=self.var_search_query).pack(side='left')
         ttk.Button(f_buttons, text='Søk', command=self.on_search).pack(side='left')
         ttk.Button(f_buttons, text='Oppdater', command=self.on_update_invoices).pack(side='left')
+        ttk.Button(f_buttons, text='Eksporter', command=self.on_export_invoices).pack(side='left')
+        ttk.Button(f_buttons, text='Eksporter alle', command=self.on_export_all_invoices).pack(side='left')
+        ttk.Checkbutton(f_buttons, text='Grupper', variable=self.var_grouped, command=self.on_group).pack(side='left')
 
         self.invoice_tree = InvoiceTree(self)
         self.invoice_tree.pack(side='top', fill='both', expand=True)
@@ -40,15 +55,24 @@ class InvoiceOverview(ttk.Frame):
         self.invoice_tree.bind('<F3>', self.on_register_error)
         self.invoice_tree.bind('<F4>', self.on_register_missing)
         self.invoice_tree.bind('<F5>', self.on_upload_invoice)
+        self.invoice_tree.bind('<F9>', self.on_export_invoices)
     
     @property
     def selected_invoice(self) -> Optional[pdf_reader.Invoice]:
         if adapter := self.invoice_tree.selected:
             return adapter.item
+
+    @property
+    def selected_invoices(self) -> List[pdf_reader.Invoice]:
+        return [adapter.item for adapter in self.invoice_tree.selected_all]
     
     def update_invoice(self, invoice) -> None:
         self.invoice_tree.update_object(invoice)
 
+    def move_invoice(self, invoice, source: Path) -> None:
+        self.invoice_tree.rekey_object(invoice, str(source))
+        self.invoice_tree.update_object(invoice)
+
     def on_selected(self, event = None) -> None:
         self.event_generate(Event.ON_SELECTED)
 
@@ -56,6 +80,9 @@ class InvoiceOverview(ttk.Frame):
         self.invoice_tree.searcher(self.var_search_query.get())
         self.event_generate(Event.ON_SEARCH)
     
+    def on_group(self, event = None) -> None:
+        self.invoice_tree.grouped = self.var_grouped.get()
+
     def on_update_invoices(self, event = None) -> None:
         self.event_generate(Event.ON_UPDATE_INVOICES)
 
@@ -71,12 +98,21 @@ class InvoiceOverview(ttk.Frame):
     def on_upload_invoice(self, event = None) -> None:
         self.event_generate(Event.ON_UPLOAD_INVOICE)
 
+    def on_export_invoices(self, event = None) -> None:
+        self.event_generate(Event.ON_EXPORT_INVOICES)
+
+    def on_export_all_invoices(self, event = None) -> None:
+        self.event_generate(Event.ON_EXPORT_ALL_INVOICES)
+
 class Application:
     def __init__(self, window):
         self.window = window
 
         self.invoices = []
         self.source = None
+        self.journal = None
+        self.export_pool = ThreadPoolExecutor(max_workers=1)
+        self.exporting = set()
         self.pdf_viewer = PdfViewer()
         
         panes = ttk.Panedwindow(self.window, orient='horizontal')
@@ -89,51 +125,168 @@ class Application:
         panes.add(self.viewer_frame, weight=1)
         self.register_events()
 
+        self.window.protocol('WM_DELETE_WINDOW', self.on_close)
+        self.flush_journal()
+
     def register_events(self) -> None:
         self.invoice_overview.bind(Event.ON_REGISTER_INVOICE, self.on_register_invoice)
         self.invoice_overview.bind(Event.ON_REGISTER_ERROR, self.on_register_error)
         self.invoice_overview.bind(Event.ON_REGISTER_MISSING, self.on_register_missing)
         self.invoice_overview.bind(Event.ON_UPLOAD_INVOICE, self.on_upload_invoice)
         self.invoice_overview.bind(Event.ON_UPDATE_INVOICES, self.on_update_invoices)
+        self.invoice_overview.bind(Event.ON_EXPORT_INVOICES, self.on_export_invoices)
+        self.invoice_overview.bind(Event.ON_EXPORT_ALL_INVOICES, self.on_export_all_invoices)
         self.invoice_overview.bind(Event.ON_SELECTED, self.on_selected)
 
+    def flush_journal(self) -> None:
+        if self.journal is not None:
+            self.journal.flush()
+        self.window.after(JOURNAL_FLUSH_DELAY, self.flush_journal)
+
+    def set_status(self, invoice, status: str) -> None:
+        invoice.status = status
+        self.journal.record_status(invoice)
+        self.invoice_overview.update_invoice(invoice)
+        self.compact_journal()
+
+    def move_invoice(self, invoice, folder: str, status: str) -> None:
+        source_file = invoice.link
+        moved_file = self.source / folder / invoice.link.name
+        if moved_file.exists():
+            mb.showerror('Flytt faktura', f'{moved_file} finnes allerede')
+            return
+
+        source_status = invoice.status
+        invoice.link = moved_file
+        invoice.status = status
+        # Written ahead of the rename. If the app stops in between, restore
+        # sees the target missing and keeps the invoice at its source.
+        self.journal.record_move(invoice, source_file)
+        self.journal.flush(force=True)
+        try:
+            source_file.rename(moved_file)
+        except OSError:
+            invoice.link = source_file
+            invoice.status = source_status
+            self.journal.record_move(invoice, moved_file)
+            raise
+
+        self.invoice_overview.move_invoice(invoice, source_file)
+        self.compact_journal()
+
+    def compact_journal(self) -> None:
+        if self.journal.needs_compaction():
+            self.journal.snapshot(self.invoices)
+
+    def on_close(self) -> None:
+        if self.journal is not None:
+            self.journal.close()
+        self.window.destroy()
+
     def on_selected(self, event = None) -> None:
         if f := self.invoice_overview.selected_invoice:
             self.pdf_viewer.display(f.link)
 
+    def is_busy(self, invoice) -> bool:
+        """ Invoices being exported can't be entered or moved until the export is done """
+        return id(invoice) in self.exporting
+
     def on_register_invoice(self, event = None) -> None:
         if invoice := self.invoice_overview.selected_invoice:
-            invoice.status = 'working'
-            self.invoice_overview.update_invoice(invoice)
+            if invoice.status == 'duplicate' or self.is_busy(invoice):
+                return
+
+            self.set_status(invoice, 'working')
+            # Make sure an interrupted registration is known after a restart
+            self.journal.flush(force=True)
 
             controller.enter_invoice(invoice)
 
-            invoice.status = 'done'
-            self.invoice_overview.update_invoice(invoice)
+            self.set_status(invoice, 'done')
     
     def on_upload_invoice(self, event = None) -> None:
         if invoice := self.invoice_overview.selected_invoice:
-            uploaded_file = self.source / 'uploaded' / invoice.link.name
-            invoice.link.rename(uploaded_file)
-            invoice.link = uploaded_file
-            invoice.status = 'uploaded'
-            self.invoice_overview.update_invoice(invoice)
+            if invoice.status == 'duplicate' or self.is_busy(invoice):
+                return
+
+            self.move_invoice(invoice, 'uploaded', 'uploaded')
     
     def on_register_missing(self, event = None) -> None:
         if invoice := self.invoice_overview.selected_invoice:
-            missing_file = self.source / 'wo' / invoice.link.name
-            invoice.link.rename(missing_file)
-            invoice.link = missing_file
-            invoice.status = 'missing_wo'
-            self.invoice_overview.update_invoice(invoice)
+            if self.is_busy(invoice):
+                return
+
+            self.move_invoice(invoice, 'wo', 'missing_wo')
     
     def on_register_error(self, event = None) -> None:
         if invoice := self.invoice_overview.selected_invoice:
-            error_file = self.source / 'err' / invoice.link.name
-            invoice.link.rename(error_file)
-            invoice.link = error_file
-            invoice.status = 'error'
-            self.invoice_overview.update_invoice(invoice)
+            if self.is_busy(invoice):
+                return
+
+            self.move_invoice(invoice, 'err', 'error')
+
+    def on_export_invoices(self, event = None) -> None:
+        invoices = [inv for inv in self.invoice_overview.selected_invoices
+                    if export.is_exportable(inv) and not self.is_busy(inv)]
+        if invoices:
+            self.start_export(invoices)
+
+    def on_export_all_invoices(self, event = None) -> None:
+        invoices = [inv for inv in self.invoices if export.is_exportable(inv) and not self.is_busy(inv)]
+        if not invoices:
+            return
+
+        if mb.askyesno('Eksporter alle', f'Eksporter {len(invoices)} fakturaer og merk dem som ferdige?'):
+            self.start_export(invoices)
+
+    def start_export(self, invoices: List[pdf_reader.Invoice]) -> None:
+        """ Writes invoices to a bulk import file and archives their PDFs in a
+            folder named after it. The work runs in a background thread, the
+            invoices are marked 'working' until it is done.
+        """
+        export_file = fd.asksaveasfilename(
+            title='Eksporter',
+            initialdir=self.source,
+            defaultextension='.csv',
+            filetypes=[(name.upper(), exporter.suffix) for name, exporter in export.exporters.items()]
+        )
+        if not export_file:
+            return
+
+        export_file = Path(export_file)
+        try:
+            export.exporter_for(export_file)
+        except ValueError as e:
+            mb.showerror('Eksporter', str(e))
+            return
+
+        for invoice in invoices:
+            self.exporting.add(id(invoice))
+            self.set_status(invoice, 'working')
+
+        # The thread works on copies, the originals may change in the meantime
+        future = self.export_pool.submit(self.run_export, [replace(inv) for inv in invoices], export_file)
+        self.window.after(EXPORT_POLL_DELAY, self.finish_export, future, invoices)
+
+    @staticmethod
+    def run_export(invoices: List[pdf_reader.Invoice], export_file: Path) -> None:
+        export.export_invoices(invoices, export_file, archive=export_file.with_suffix(''))
+
+    def finish_export(self, future: Future, invoices: List[pdf_reader.Invoice]) -> None:
+        """ Polled from the Tk main loop, so statuses are only changed on the UI thread """
+        if not future.done():
+            self.window.after(EXPORT_POLL_DELAY, self.finish_export, future, invoices)
+            return
+
+        error = future.exception()
+        for invoice in invoices:
+            self.exporting.discard(id(invoice))
+            # Leave alone anything that changed status while the export ran
+            if invoice.status == 'working':
+                self.set_status(invoice, 'success' if error else 'done')
+
+        if error:
+            mb.showerror('Eksporter', str(error))
 
     def on_update_invoices(self, event = None) -> None:
         if folder := fd.askdirectory(title='Velg arbeid mappe'):
@@ -148,7 +301,28 @@ class Application:
             up = self.source / 'uploaded'
             up.mkdir(exist_ok=True)
 
-            self.invoices = pdf_reader.parse_folder(self.source)
+            if self.journal is not None:
+                self.journal.close()
+            self.journal = journal.SessionJournal(self.source)
+            restored = self.journal.restore() or {}
+            # Files removed outside the application since the last session are left out
+            restored = {link: d for link, d in restored.items() if Path(link).exists()}
+            self.invoices = [pdf_reader.Invoice.from_dict(d) for d in restored.values()]
+
+            index_file = self.source / invoice_index.INDEX_FILENAME
+            index = invoice_index.InvoiceIndex.load(index_file)
+            # Invoices handled earlier count as originals for resends in the root folder
+            for sub in (up, err, wo):
+                pdf_reader.index_folder(sub, index)
+            # Restored invoices are not parsed again, but a rebuilt index still needs them
+            for invoice in self.invoices:
+                if invoice.link not in index:
+                    index.add(invoice, invoice_index.file_digest(invoice.link))
+            self.invoices += pdf_reader.parse_folder(self.source, index, exclude=restored)
+            index.save(index_file)
+
+            self.journal.snapshot(self.invoices)
+
             self.invoice_overview.invoice_tree.content = self.invoices
 
 
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+INDEX_FILENAME = 'invoice_index.json'
+
+logger = logging.getLogger(__name__)
+
+def file_digest(filename) -> str:
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+class InvoiceIndex:
+    """ Index of seen invoices for catching resent duplicates.
+
+        Invoices are keyed by (invoice_type, number), with a hash of the file
+        content as a secondary key. A file is identified by its content hash,
+        mapped to the full path it was last seen at, so an invoice moved to
+        'uploaded', 'err' or 'wo' is recognized as the same file while a
+        resend with the same name is not.
+    """
+    def __init__(self):
+        self._numbers: Dict[Tuple[str, int], str] = {}
+        self._digests: Dict[str, str] = {}
+        self._paths: Dict[str, str] = {}
+
+    def __len__(self):
+        return len(self._digests)
+
+    def __contains__(self, filename):
+        return str(filename) in self._paths
+
+    @staticmethod
+    def number_key(invoice) -> Optional[Tuple[str, int]]:
+        if invoice.invoice_type == 'Unknown' or not invoice.number:
+            return None
+        return (invoice.invoice_type, invoice.number)
+
+    def find(self, invoice, digest: str) -> Optional[str]:
+        """ Returns the path of another file holding the same invoice, if any """
+        path = str(invoice.link)
+
+        # Same content at another path that still exists. If the old path is
+        # gone the file has been moved and this is the same invoice.
+        if (known := self._digests.get(digest, path)) != path and Path(known).exists():
+            return known
+
+        if (key := self.number_key(invoice)) and self._numbers.get(key, digest) != digest:
+            return self._digests[self._numbers[key]]
+
+    def add(self, invoice, digest: str) -> None:
+        path = str(invoice.link)
+
+        if (known := self._digests.get(digest)) is not None and self._paths.get(known) == digest:
+            del self._paths[known]
+        self._digests[digest] = path
+        self._paths[path] = digest
+
+        if key := self.number_key(invoice):
+            self._numbers.setdefault(key, digest)
+
+    def check(self, invoice) -> bool:
+        """ Adds invoice to the index and marks it as 'duplicate' if another
+            file with the same number or content has been seen before.
+        """
+        digest = file_digest(invoice.link)
+
+        if self.find(invoice, digest) is not None:
+            invoice.status = 'duplicate'
+            return True
+
+        self.add(invoice, digest)
+        return False
+
+    def save(self, filename) -> None:
+        entries = {
+            'numbers': [[t, n, digest] for (t, n), digest in self._numbers.items()],
+            'digests': self._digests
+        }
+        tmp_file = Path(filename).with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, filename)
+
+    @classmethod
+    def load(cls, filename) -> 'InvoiceIndex':
+        """ Loads a saved index. A missing or unreadable index gives an empty
+            one, which is rebuilt as the folders are indexed again.
+        """
+        index = cls()
+
+        if Path(filename).exists():
+            try:
+                with open(filename, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+
+                numbers = {(t, n): digest for t, n, digest in entries['numbers']}
+                digests = dict(entries['digests'])
+            except (ValueError, KeyError, TypeError):
+                logger.warning('Invoice index %s is corrupt, rebuilding it', filename)
+                return index
+
+            index._numbers = numbers
+            index._digests = digests
+            index._paths = {path: digest for digest, path in digests.items()}
+
+        return index
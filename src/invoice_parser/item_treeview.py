@@ -1,6 +1,8 @@
 import abc
 from tkinter import font, ttk
-from typing import Any, Dict, Tuple, TypeVar
+from typing import Any, Dict, Optional, Tuple, TypeVar
+
+from workorder_index import WorkOrderIndex
 
 class TreeviewAdapter(abc.ABC):
     """ Abstract class for containing objects to be displayed in a treeview """
@@ -26,7 +28,7 @@ class TreeviewAdapter(abc.ABC):
         return f'<{item.__class__.__qualname__}({item.link})>'
 
 class InvoiceAdapter(TreeviewAdapter):
-    headings = ['File', 'Type', 'Status']
+    headings = ['File', 'Type', 'Status', 'Amount']
 
     def __init__(self, invoice):
         super().__init__(invoice)
@@ -45,6 +47,8 @@ class InvoiceAdapter(TreeviewAdapter):
             return ('working', )
         elif self.item.status == 'uploaded':
             return ('uploaded', )
+        elif self.item.status == 'duplicate':
+            return ('duplicate', )
         else:
             return super().tag(index)
     
@@ -52,11 +56,12 @@ class InvoiceAdapter(TreeviewAdapter):
         return (
             self.item.link.name,
             self.item.invoice_type,
-            self.item.status
+            self.item.status,
+            self.item.amount if self.item.amount is not None else ''
         )
     
     def key(self) -> str:
-        return self.item.link.name
+        return str(self.item.link)
 
 
 Adapter = TypeVar('Adapter', bound=InvoiceAdapter)
@@ -128,6 +133,10 @@ class ItemTreeview(ttk.Treeview):
     @property
     def selected(self):
         return self._item_content.get(self.focus(), None)
+
+    @property
+    def selected_all(self):
+        return [self._item_content[iid] for iid in self.selection() if iid in self._item_content]
     
     def create_adapter(self, object) -> Adapter:
         return self.adapter_class(object)
@@ -173,6 +182,12 @@ class ItemTreeview(ttk.Treeview):
                 self.focus(adapter.iid)
                 self.selection_set(adapter.iid)
 
+    def rekey_object(self, object: Any, old_key: str):
+        """ Keeps the row of an object whose key has changed, e.g. a moved file """
+        if adapter := self._content.pop(old_key, None):
+            adapter.item = object
+            self._content[adapter.key()] = adapter
+
     def delete_object(self, object: Any):
         key = self.adapter_class.generate_key(object)
         if key in self.content:
@@ -193,9 +208,9 @@ class ItemTreeview(ttk.Treeview):
         self._item_content = {}
         self.delete(*self.get_children())
 
-    def create_item(self, adapter, index):
+    def create_item(self, adapter, index, parent=''):
         adapter.iid = self.insert(
-            parent='', 
+            parent=parent, 
             index='end', 
             text=adapter.text(), 
             values=adapter.values(), 
@@ -356,13 +371,186 @@ class ScrollbarTreeview(ttk.Treeview):
         pass
 
 class InvoiceTree(ItemTreeview, SearchableTree, ScrollbarTreeview):
+    MISSING_WORKORDER = 'Mangler arbeidsordre'
+
     def __init__(self, master, **kwargs):
         super().__init__(master=master, adapter=InvoiceAdapter)
         self._num_search_values = 3
 
+        self.workorders = WorkOrderIndex()
+        self._grouped = False
+        self._groups: Dict[Optional[str], str] = {}
+        self._group_iids: Dict[str, Optional[str]] = {}
+        self._loaded_groups = set()
+
+        self.heading('#0', text='Work order')
+        self.column('#0', width=160, stretch=False)
+        self.bind('<<TreeviewOpen>>', self.on_open_group)
+
         self.tag_configure('missing_wo', background='grey82', foreground='black')
         self.tag_configure('error', background='gold', foreground='yellow')
         self.tag_configure('done', background='lightgreen', foreground='grey23')
         self.tag_configure('working', background='purple', foreground='grey45')
         self.tag_configure('uploaded', background='lightgreen', foreground='grey45')
+        self.tag_configure('duplicate', background='salmon', foreground='grey23')
+        self.tag_configure('workorder', background='steelblue', foreground='white')
+
+    @property
+    def grouped(self) -> bool:
+        return self._grouped
+
+    @grouped.setter
+    def grouped(self, grouped: bool):
+        """ Show work orders as parent rows, with invoices loaded when a row is opened """
+        self._grouped = grouped
+        self['show'] = 'tree headings' if grouped else 'headings'
+        self.build_tree()
+
+    def build_tree(self):
+        self.workorders.clear()
+        for key, adapter in self.content.items():
+            self.workorders.add(key, adapter.item)
+
+        if not self._grouped:
+            super().build_tree()
+            return
+
+        self.clear_tree()
+        for workorder in sorted(self.workorders.workorders, key=lambda wo: (wo is None, str(wo))):
+            self.create_group(workorder)
+
+    def clear_tree(self):
+        # Rows hidden by a search are not children of the root, so they are
+        # deleted here or the next search would attach them again
+        self.delete(*[iid for iid in self._detached if self.exists(iid)])
+        self._detached = set()
+
+        super().clear_tree()
+        self._groups = {}
+        self._group_iids = {}
+        self._loaded_groups = set()
+
+    def create_group(self, workorder: Optional[str]):
+        iid = self.insert(
+            parent='',
+            index='end',
+            text=self.group_text(workorder),
+            values=self.group_values(workorder),
+            tag=('workorder',)
+        )
+        # Placeholder so the row can be opened before its invoices are loaded
+        self.insert(parent=iid, index='end')
+
+        self._groups[workorder] = iid
+        self._group_iids[iid] = workorder
+
+    def group_text(self, workorder: Optional[str]) -> str:
+        label = workorder if workorder is not None else self.MISSING_WORKORDER
+        return f'{label} ({self.workorders.count(workorder)})'
+
+    def group_values(self, workorder: Optional[str]) -> Tuple:
+        """ Only the amount column has a meaning for a group, its total """
+        return ('', '', '', self.workorders.total(workorder))
+
+    def group_matches(self, workorder: Optional[str], query: str) -> bool:
+        """ Checks the work order and the invoices in it, loaded or not """
+        if query in self.group_text(workorder).lower():
+            return True
+
+        for key in self.workorders.keys(workorder):
+            values = self.content[key].values()[:self._num_search_values]
+            if query in ', '.join(str(v).lower() for v in values):
+                return True
 
+        return False
+
+    def searcher(self, query: str):
+        """ In grouped mode whole work orders are shown or hidden, by matching
+            the query against the work order and the invoices in it.
+        """
+        if not self._grouped:
+            super().searcher(query)
+            return
+
+        i_r = -1
+        for workorder, iid in self._groups.items():
+            if self.group_matches(workorder, query.lower()):
+                i_r += 1
+                self.reattach(iid, '', i_r)
+                self._detached.discard(iid)
+            else:
+                self._detached.add(iid)
+                self.detach(iid)
+
+        self.event_generate('<<TreeviewSearched>>')
+
+    def load_group(self, workorder: Optional[str]):
+        if workorder in self._loaded_groups:
+            return
+
+        iid = self._groups[workorder]
+        self.delete(*self.get_children(iid))
+        for i, key in enumerate(self.workorders.keys(workorder)):
+            self.create_item(self.content[key], i, parent=iid)
+
+        self._loaded_groups.add(workorder)
+
+    def on_open_group(self, event = None):
+        iid = self.focus()
+        if iid in self._group_iids:
+            self.load_group(self._group_iids[iid])
+
+    def update_object(self, object: Any):
+        key = self.create_adapter(object).key()
+        self.workorders.update(key, object)
+
+        if not self._grouped:
+            super().update_object(object)
+            return
+
+        if key not in self.content:
+            self._content[key] = self.create_adapter(object)
+        adapter = self.content[key]
+
+        workorder = object.workorder
+        if workorder not in self._groups:
+            self.create_group(workorder)
+        elif workorder in self._loaded_groups:
+            if adapter.iid is not None and self.exists(adapter.iid):
+                self.item(adapter.iid, values=adapter.values(), tag=adapter.tag(self.index(adapter.iid)))
+            else:
+                self.create_item(adapter, self.workorders.count(workorder) - 1, parent=self._groups[workorder])
+
+        self.item(self._groups[workorder], text=self.group_text(workorder), values=self.group_values(workorder))
+
+    def rekey_object(self, object: Any, old_key: str):
+        self.workorders.remove(old_key)
+        super().rekey_object(object, old_key)
+        self.workorders.add(self.create_adapter(object).key(), object)
+
+    def delete_object(self, object: Any):
+        key = self.create_adapter(object).key()
+        self.workorders.remove(key)
+
+        # In grouped mode the row only exists if its group has been opened
+        if adapter := self._content.pop(key, None):
+            if adapter.iid is not None and self.exists(adapter.iid):
+                self.delete(adapter.iid)
+            self._item_content.pop(adapter.iid, None)
+
+        workorder = object.workorder
+        if self._grouped and workorder in self._groups:
+            iid = self._groups[workorder]
+            if self.workorders.count(workorder):
+                self.item(iid, text=self.group_text(workorder), values=self.group_values(workorder))
+            else:
+                self.delete(iid)
+                del self._groups[workorder]
+                del self._group_iids[iid]
+                self._loaded_groups.discard(workorder)
+                self._detached.discard(iid)
+
+    def on_sort(self, heading: str = None, reverse: bool = True):
+        # Sorting moves rows to the top level, which would break up the groups
+        if not self._grouped:
+            super().on_sort(heading, reverse)
@@ -0,0 +1,132 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+SNAPSHOT_FILENAME = 'session_snapshot.json'
+JOURNAL_FILENAME = 'session_journal.jsonl'
+
+class SessionJournal:
+    """ Append-only journal of invoice status changes and file moves.
+
+        The session is restored by loading the last snapshot and replaying the
+        journal on top of it. Records are written as they happen but only
+        fsynced every 'batch_size' records or 'sync_interval' seconds, and the
+        journal is folded into a new snapshot once it holds 'compact_size'
+        records.
+
+        Invoices are identified by the full path of their file, and a move
+        record carries both the old and the new path.
+    """
+    def __init__(self, folder, batch_size: int = 32, sync_interval: float = 1.0, compact_size: int = 10000):
+        self.folder = Path(folder)
+        self.snapshot_file = self.folder / SNAPSHOT_FILENAME
+        self.journal_file = self.folder / JOURNAL_FILENAME
+
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        self.compact_size = compact_size
+
+        self._file = None
+        self._records = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def restore(self) -> Optional[Dict[str, Dict]]:
+        """ Returns the saved invoices by path, or None if there is no saved session """
+        if not self.snapshot_file.exists():
+            return None
+
+        with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+            invoices = {d['link']: d for d in json.load(f)}
+
+        # Moves are journaled before the file is renamed, so the last move of
+        # an invoice may not have happened. Remember how to undo each one.
+        moves = {}
+
+        self._records = 0
+        if self.journal_file.exists():
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Partly written record from a crash, nothing after it was synced
+                        break
+
+                    if record['op'] == 'move':
+                        if data := invoices.pop(record['source'], None):
+                            moves[record['link']] = (record['source'], data['status'])
+                            moves.pop(record['source'], None)
+                            data['link'] = record['link']
+                            invoices[record['link']] = data
+                    if data := invoices.get(record['link']):
+                        data['status'] = record['status']
+                    self._records += 1
+
+        for link, (source, status) in moves.items():
+            if link in invoices and not Path(link).exists() and Path(source).exists():
+                data = invoices.pop(link)
+                data['link'] = source
+                data['status'] = status
+                invoices[source] = data
+
+        return invoices
+
+    def snapshot(self, invoices: Iterable) -> None:
+        """ Writes all invoices to a new snapshot and empties the journal """
+        self.close()
+
+        tmp_file = self.snapshot_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump([inv.to_dict() for inv in invoices], f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.snapshot_file)
+
+        # Truncate only after the snapshot is in place, so a crash in between
+        # replays records that are already applied, which is harmless
+        open(self.journal_file, 'w').close()
+        self._records = 0
+
+    def record_status(self, invoice) -> None:
+        self._append({'op': 'status', 'link': str(invoice.link), 'status': invoice.status})
+
+    def record_move(self, invoice, source) -> None:
+        """ Records that invoice was moved from source to its current link """
+        self._append({
+            'op': 'move',
+            'source': str(source),
+            'link': str(invoice.link),
+            'status': invoice.status
+        })
+
+    def needs_compaction(self) -> bool:
+        return self._records >= self.compact_size
+
+    def flush(self, force: bool = False) -> None:
+        """ Fsyncs written records if the batch is full, the interval has passed or 'force' is set """
+        if self._file is None or not self._unsynced:
+            return
+
+        if force or self._unsynced >= self.batch_size or time.monotonic() - self._last_sync >= self.sync_interval:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.flush(force=True)
+            self._file.close()
+            self._file = None
+
+    def _append(self, record: Dict) -> None:
+        if self._file is None:
+            self._file = open(self.journal_file, 'a', encoding='utf-8')
+
+        self._file.write(json.dumps(record) + '\n')
+        self._records += 1
+        self._unsynced += 1
+        self.flush()
@@ -5,7 +5,7 @@ from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 
 import dateutil.parser as date_parser
 from PyPDF2 import PdfFileReader
@@ -25,6 +25,32 @@ class Invoice:
     amount_vat: Optional[Decimal] = None
     status: str = 'success'
 
+    def to_dict(self) -> Dict:
+        """ JSON friendly representation of the invoice """
+        return {
+            'link': str(self.link),
+            'invoice_type': self.invoice_type,
+            'number': self.number,
+            'workorder': self.workorder,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'amount': str(self.amount) if self.amount is not None else None,
+            'amount_vat': str(self.amount_vat) if self.amount_vat is not None else None,
+            'status': self.status
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Invoice':
+        return cls(
+            Path(data['link']),
+            data['invoice_type'],
+            data['number'],
+            data['workorder'],
+            datetime.fromisoformat(data['timestamp']) if data['timestamp'] else None,
+            Decimal(data['amount']) if data['amount'] is not None else None,
+            Decimal(data['amount_vat']) if data['amount_vat'] is not None else None,
+            data['status']
+        )
+
 def extract_text(filename: str):
     with open(filename, 'rb') as f:
         pfr = PdfFileReader(f)
@@ -50,14 +76,26 @@ def parse_invoice(filename) -> Invoice:
     
     return Invoice(filename, inv_type, inv_no, inv_wo, inv_dt, inv_amt, status=inv_status)
 
-def parse_folder(folder) -> List[Invoice]:
+def parse_folder(folder, index=None, exclude: Iterable = ()) -> List[Invoice]:
+    exclude = {Path(p) for p in exclude}
     invoices = []
     for p in Path(folder).glob('*.pdf'):
+        if p in exclude:
+            continue
+
         inv = parse_invoice(p)
+        if index is not None:
+            index.check(inv)
         invoices.append(inv)
 
     return invoices
 
+def index_folder(folder, index) -> None:
+    """ Adds the PDFs in folder to the index, parsing only files it hasn't seen at their current path """
+    for p in Path(folder).glob('*.pdf'):
+        if p not in index:
+            index.check(parse_invoice(p))
+
 def _determine_work_order(text: str) -> Optional[str]:
     if match := re.search('Booking Number:(\d+)[/](\d+)', text):
         wo1 = match.group(1)
@@ -0,0 +1,308 @@
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+
+import pdf_reader
+
+logger = logging.getLogger(__name__)
+
+def _warm_up():
+    """ Imports the parser in a worker so the first request doesn't pay for it """
+    import pdf_reader  # noqa: F401
+
+def _parse(filename: str) -> Dict:
+    try:
+        return pdf_reader.parse_invoice(Path(filename)).to_dict()
+    except Exception as e:
+        return {'link': filename, 'status': 'error', 'error': str(e)}
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.rejected = 0
+        self.parsed = 0
+        self.errors = 0
+        self.parse_seconds = 0.0
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'uptime': time.time() - self.started,
+                'requests': self.requests,
+                'rejected': self.rejected,
+                'parsed': self.parsed,
+                'errors': self.errors,
+                'parse_seconds': self.parse_seconds,
+            }
+
+
+class ParseServer(ThreadingHTTPServer):
+    """ HTTP server keeping a warm pool of parser processes.
+
+        At most 'queue_size' files are queued or being parsed at once. Requests
+        that would exceed this are rejected with 503 so clients can back off,
+        and request bodies larger than 'max_body_size' bytes with 413.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, workers: int = None, queue_size: int = 64, max_body_size: int = 16 << 20):
+        super().__init__(address, ParseRequestHandler)
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.max_body_size = max_body_size
+        self.queued = 0
+        self.metrics = Metrics()
+        self._lock = threading.Lock()
+
+        # Workers are otherwise started on first use, start them all up front
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_up)
+        for future in [self.pool.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+
+    def acquire(self, count: int) -> bool:
+        """ Reserves count queue slots, or none if there isn't room for all """
+        with self._lock:
+            if self.queued + count > self.queue_size:
+                return False
+            self.queued += count
+            return True
+
+    def release(self, count: int) -> None:
+        with self._lock:
+            self.queued -= count
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown()
+
+
+class ParseRequestHandler(BaseHTTPRequestHandler):
+    """ GET  /health   - liveness and queue state
+        GET  /metrics  - request and parse counters
+        POST /parse    - JSON body {"paths": [...]} or a raw PDF upload
+                         (Content-Type: application/pdf). Results are streamed
+                         back as one JSON object per line, in completion order.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {
+                'status': 'ok',
+                'workers': self.server.workers,
+                'queue_size': self.server.queue_size,
+                'queued': self.server.queued,
+            })
+        elif self.path == '/metrics':
+            self.send_json(200, self.server.metrics.as_dict())
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/parse':
+            self.send_json(404, {'error': 'not found'})
+            return
+
+        self.server.metrics.add(requests=1)
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+
+        if length < 0:
+            self.close_connection = True
+            self.send_json(400, {'error': 'invalid Content-Length'})
+            return
+
+        if length > self.server.max_body_size:
+            # The body is never read, so the connection can't be reused
+            self.close_connection = True
+            self.send_json(413, {'error': f'body larger than {self.server.max_body_size} bytes'})
+            return
+
+        if self.headers.get('Content-Type', '').startswith('application/pdf'):
+            # Reserve the slot first so a full queue costs neither memory nor disk
+            if not self.reserve(1):
+                self.close_connection = True
+                return
+
+            fd, upload = tempfile.mkstemp(suffix='.pdf')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    while length > 0:
+                        chunk = self.rfile.read(min(length, 1 << 16))
+                        if not chunk:
+                            raise ConnectionError('upload ended early')
+                        f.write(chunk)
+                        length -= len(chunk)
+            except BaseException:
+                os.remove(upload)
+                self.server.release(1)
+                raise
+
+            self.parse_paths([upload], upload=upload)
+        else:
+            try:
+                paths = json.loads(self.rfile.read(length))['paths']
+            except (ValueError, KeyError, TypeError):
+                paths = None
+
+            if not isinstance(paths, list) or not all(isinstance(p, str) for p in paths):
+                self.send_json(400, {'error': 'expected {"paths": [...]} or a PDF upload'})
+                return
+
+            if self.reserve(len(paths)):
+                self.parse_paths(paths)
+
+    def reserve(self, count: int) -> bool:
+        """ Reserves queue slots for count files, or sends 413/503 and returns False """
+        if count > self.server.queue_size:
+            self.send_json(413, {'error': f'batch larger than queue size {self.server.queue_size}'})
+            return False
+
+        if not self.server.acquire(count):
+            self.server.metrics.add(rejected=1)
+            self.send_json(503, {'error': 'queue full'}, headers={'Retry-After': '1'})
+            return False
+
+        return True
+
+    def parse_paths(self, paths: List[str], upload: str = None) -> None:
+        """ Parses paths in the pool and streams the results. The queue slots
+            must be reserved. 'upload' is a temporary file that is removed once
+            the worker is done with it.
+        """
+        start = time.perf_counter()
+        futures = []
+        try:
+            for p in paths:
+                future = self.server.pool.submit(_parse, p)
+                # Slots are freed when the work is finished or cancelled, not
+                # when the client goes away, so the bound holds for the pool
+                future.add_done_callback(lambda _: self.server.release(1))
+                futures.append(future)
+        finally:
+            self.server.release(len(paths) - len(futures))
+            if upload is not None:
+                if futures:
+                    futures[0].add_done_callback(lambda _: os.remove(upload))
+                else:
+                    os.remove(upload)
+
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+            for future in as_completed(futures):
+                result = future.result()
+                self.server.metrics.add(parsed=1, errors=int(result['status'] == 'error'))
+                self.write_chunk(json.dumps(result).encode() + b'\n')
+
+            self.server.metrics.add(parse_seconds=time.perf_counter() - start)
+            self.write_chunk(b'')
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+    def send_json(self, code: int, data: Dict, headers: Dict = None) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info(format, *args)
+
+
+def _timed_request(host: str, port: int, body: bytes):
+    start = time.perf_counter()
+    conn = HTTPConnection(host, port)
+    try:
+        conn.request('POST', '/parse', body, {'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        response.read()
+        return response.status, time.perf_counter() - start
+    finally:
+        conn.close()
+
+def load_test(host: str, port: int, paths: List[str], requests: int = 100, concurrency: int = 8) -> Dict:
+    """ Sends 'requests' batches of paths to a running service from 'concurrency'
+        clients and returns response counts and latencies in seconds.
+    """
+    body = json.dumps({'paths': paths}).encode()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: _timed_request(host, port, body), range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(t for status, t in results if status == 200)
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    return {
+        'seconds': elapsed,
+        'requests_per_second': requests / elapsed,
+        'statuses': statuses,
+        'p50': latencies[len(latencies) // 2] if latencies else None,
+        'p95': latencies[int(len(latencies) * 0.95)] if latencies else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Local invoice parsing service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--queue-size', type=int, default=64)
+    parser.add_argument('--max-body-size', type=int, default=16 << 20)
+    parser.add_argument('--load-test', nargs='+', metavar='PDF',
+                        help='send the files as batches to a running service instead of serving')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.load_test:
+        paths = [str(Path(p).resolve()) for p in args.load_test]
+        print(json.dumps(load_test(args.host, args.port, paths, args.requests, args.concurrency), indent=2))
+        return
+
+    with ParseServer((args.host, args.port), args.workers, args.queue_size, args.max_body_size) as server:
+        logger.info('Serving on http://%s:%s', args.host, args.port)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
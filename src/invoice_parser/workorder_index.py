@@ -0,0 +1,83 @@
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+class WorkOrderIndex:
+    """ Groups invoices by work order and keeps running totals of 'amount'
+        per work order, per status and per (work order, status).
+
+        Invoices are changed in place by the application, so the index keeps a
+        snapshot of the values it last counted and 'update' moves the amount
+        from the old work order and status to the new ones.
+    """
+    def __init__(self):
+        self._invoices: Dict[Optional[str], Dict[Hashable, Any]] = defaultdict(dict)
+        self._entries: Dict[Hashable, Tuple[Optional[str], str, Decimal]] = {}
+        self._totals: Dict[Optional[str], Decimal] = defaultdict(Decimal)
+        self._status_totals: Dict[str, Decimal] = defaultdict(Decimal)
+        self._workorder_status_totals: Dict[Tuple[Optional[str], str], Decimal] = defaultdict(Decimal)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def workorders(self) -> List[Optional[str]]:
+        return list(self._invoices)
+
+    def invoices(self, workorder: Optional[str]) -> List[Any]:
+        return list(self._invoices.get(workorder, {}).values())
+
+    def keys(self, workorder: Optional[str]) -> List[Hashable]:
+        return list(self._invoices.get(workorder, {}))
+
+    def count(self, workorder: Optional[str]) -> int:
+        return len(self._invoices.get(workorder, {}))
+
+    def total(self, workorder: Optional[str]) -> Decimal:
+        return self._totals.get(workorder, Decimal())
+
+    def status_total(self, status: str) -> Decimal:
+        return self._status_totals.get(status, Decimal())
+
+    def workorder_status_total(self, workorder: Optional[str], status: str) -> Decimal:
+        return self._workorder_status_totals.get((workorder, status), Decimal())
+
+    def clear(self) -> None:
+        self._invoices.clear()
+        self._entries.clear()
+        self._totals.clear()
+        self._status_totals.clear()
+        self._workorder_status_totals.clear()
+
+    def add(self, key: Hashable, invoice: Any) -> None:
+        if key in self._entries:
+            self.remove(key)
+
+        amount = invoice.amount or Decimal()
+        workorder, status = invoice.workorder, invoice.status
+
+        self._entries[key] = (workorder, status, amount)
+        self._invoices[workorder][key] = invoice
+        self._count(workorder, status, amount)
+
+    def remove(self, key: Hashable) -> None:
+        if key not in self._entries:
+            return
+
+        workorder, status, amount = self._entries.pop(key)
+        del self._invoices[workorder][key]
+        if not self._invoices[workorder]:
+            del self._invoices[workorder]
+            del self._totals[workorder]
+        self._count(workorder, status, -amount)
+
+    update = add
+
+    def _count(self, workorder, status, amount) -> None:
+        if workorder in self._invoices:
+            self._totals[workorder] += amount
+        self._status_totals[status] += amount
+        self._workorder_status_totals[(workorder, status)] += amount
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The package modules import each other by name, as when run from src/invoice_parser
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src' / 'invoice_parser'))
@@ -0,0 +1,102 @@
+import tempfile
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from xml.etree import ElementTree
+
+from src.invoice_parser import export
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.folder = Path(self.tmp.name)
+
+        self.invoices = []
+        for i in range(3):
+            link = self.folder / f'{i}.pdf'
+            link.write_bytes(b'%PDF' + bytes([i]))
+            self.invoices.append(SimpleNamespace(
+                link=link,
+                number=1000 + i,
+                workorder='900001',
+                timestamp=datetime(2021, 3, 1),
+                amount=Decimal('12.50'),
+                status='success'
+            ))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_is_exportable(self):
+        self.assertTrue(export.is_exportable(self.invoices[0]))
+        self.invoices[0].status = 'done'
+        self.assertFalse(export.is_exportable(self.invoices[0]))
+        self.invoices[1].workorder = None
+        self.assertFalse(export.is_exportable(self.invoices[1]))
+        self.invoices[2].status = 'uploaded'
+        self.assertFalse(export.is_exportable(self.invoices[2]))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            export.export_invoices(self.invoices, self.folder / 'out.txt')
+        self.assertFalse((self.folder / 'out.txt').exists())
+
+    def test_export_csv(self):
+        export_file = self.folder / 'out.csv'
+        self.assertEqual(export.export_invoices(self.invoices, export_file), 3)
+
+        lines = export_file.read_text(encoding='utf-8').splitlines()
+        self.assertEqual(lines[0], 'date;number;amount;workorder')
+        self.assertEqual(lines[1], '010321;1000;12,50;900001')
+
+    def test_export_xml(self):
+        export_file = self.folder / 'out.xml'
+        export.export_invoices(self.invoices, export_file)
+
+        root = ElementTree.parse(export_file).getroot()
+        self.assertEqual(len(root), 3)
+        self.assertEqual(root[2].find('number').text, '1002')
+
+    def test_archive_and_verify(self):
+        export_file = self.folder / 'out.csv'
+        export.export_invoices(self.invoices, export_file)
+        archive = self.folder / 'archive'
+        export.archive_invoices(self.invoices, archive, export_file)
+
+        self.assertEqual(export.verify_manifest(archive, export_file), [])
+
+        (archive / '1.pdf').write_bytes(b'changed')
+        self.assertEqual(export.verify_manifest(archive, export_file), ['1.pdf'])
+
+    def test_export_with_archive(self):
+        export_file = self.folder / 'out.csv'
+        archive = self.folder / 'archive'
+        export.export_invoices(self.invoices, export_file, archive=archive)
+
+        self.assertTrue(export_file.exists())
+        self.assertEqual(export.verify_manifest(archive, export_file), [])
+
+    def test_failed_archive_leaves_no_export(self):
+        self.invoices[1].link.unlink()
+        export_file = self.folder / 'out.csv'
+
+        with self.assertRaises(FileNotFoundError):
+            export.export_invoices(self.invoices, export_file, archive=self.folder / 'archive')
+
+        self.assertFalse(export_file.exists())
+        self.assertFalse((self.folder / 'out.csv.tmp').exists())
+
+    def test_failed_writer_leaves_no_temporary_file(self):
+        self.invoices[1].timestamp = None
+        export_file = self.folder / 'out.csv'
+
+        with self.assertRaises(TypeError):
+            export.export_invoices(self.invoices, export_file)
+
+        self.assertEqual(list(self.folder.glob('out.csv*')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
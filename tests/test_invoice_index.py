@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from src.invoice_parser.invoice_index import InvoiceIndex
+
+def make_invoice(folder, name, number, content=None):
+    link = Path(folder) / name
+    link.write_bytes(content if content is not None else name.encode())
+    return SimpleNamespace(link=link, invoice_type='ncl', number=number, status='success')
+
+class TestInvoiceIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.folder = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_duplicate_number(self):
+        index = InvoiceIndex()
+        self.assertFalse(index.check(make_invoice(self.folder, 'a.pdf', 1)))
+        dup = make_invoice(self.folder, 'b.pdf', 1)
+        self.assertTrue(index.check(dup))
+        self.assertEqual(dup.status, 'duplicate')
+
+    def test_duplicate_content(self):
+        index = InvoiceIndex()
+        index.check(make_invoice(self.folder, 'a.pdf', 0, b'same'))
+        self.assertTrue(index.check(make_invoice(self.folder, 'b.pdf', 0, b'same')))
+
+    def test_same_file_is_not_duplicate(self):
+        index = InvoiceIndex()
+        inv = make_invoice(self.folder, 'a.pdf', 1)
+        index.check(inv)
+        self.assertFalse(index.check(inv))
+
+    def test_resend_with_same_name(self):
+        index = InvoiceIndex()
+        (self.folder / 'uploaded').mkdir()
+        index.check(make_invoice(self.folder / 'uploaded', 'a.pdf', 1))
+        self.assertTrue(index.check(make_invoice(self.folder, 'a.pdf', 1, b'resent')))
+        self.assertTrue(index.check(make_invoice(self.folder, 'b.pdf', 0, b'a.pdf')))
+
+    def test_moved_file_is_not_duplicate(self):
+        index = InvoiceIndex()
+        inv = make_invoice(self.folder, 'a.pdf', 1)
+        index.check(inv)
+
+        (self.folder / 'uploaded').mkdir()
+        inv.link = inv.link.rename(self.folder / 'uploaded' / 'a.pdf')
+        self.assertNotIn(inv.link, index)
+        self.assertFalse(index.check(inv))
+        self.assertIn(inv.link, index)
+
+    def test_save_and_load(self):
+        index = InvoiceIndex()
+        index.check(make_invoice(self.folder, 'a.pdf', 1))
+        index.save(self.folder / 'index.json')
+
+        loaded = InvoiceIndex.load(self.folder / 'index.json')
+        self.assertEqual(len(loaded), 1)
+        self.assertTrue(loaded.check(make_invoice(self.folder, 'b.pdf', 1)))
+
+
+    def test_load_corrupt_index(self):
+        (self.folder / 'index.json').write_text('{"numbers": [[')
+        self.assertEqual(len(InvoiceIndex.load(self.folder / 'index.json')), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.invoice_parser.journal import JOURNAL_FILENAME, SessionJournal
+
+class Entry:
+    def __init__(self, link, status='success'):
+        self.link = Path(link)
+        self.status = status
+
+    def to_dict(self):
+        return {'link': str(self.link), 'status': self.status}
+
+class TestSessionJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.folder = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_no_session(self):
+        self.assertIsNone(SessionJournal(self.folder).restore())
+
+    def test_replay(self):
+        a, b = Entry(self.folder / 'a.pdf'), Entry(self.folder / 'b.pdf')
+        journal = SessionJournal(self.folder)
+        journal.snapshot([a, b])
+
+        a.status = 'done'
+        journal.record_status(a)
+        source = b.link
+        b.link = self.folder / 'err' / 'b.pdf'
+        b.status = 'error'
+        journal.record_move(b, source)
+        journal.close()
+
+        restored = SessionJournal(self.folder).restore()
+        self.assertEqual(restored[str(a.link)]['status'], 'done')
+        self.assertNotIn(str(source), restored)
+        self.assertEqual(restored[str(b.link)]['link'], str(b.link))
+        self.assertEqual(restored[str(b.link)]['status'], 'error')
+
+    def test_unfinished_move_is_undone(self):
+        a = Entry(self.folder / 'a.pdf')
+        a.link.write_bytes(b'a')
+        journal = SessionJournal(self.folder)
+        journal.snapshot([a])
+
+        # The move is journaled but the app stops before the file is renamed
+        source = a.link
+        a.link = self.folder / 'uploaded' / 'a.pdf'
+        a.status = 'uploaded'
+        journal.record_move(a, source)
+        journal.close()
+
+        restored = SessionJournal(self.folder).restore()
+        self.assertEqual(list(restored), [str(source)])
+        self.assertEqual(restored[str(source)]['status'], 'success')
+
+    def test_partial_record_is_ignored(self):
+        a = Entry(self.folder / 'a.pdf', 'working')
+        journal = SessionJournal(self.folder)
+        journal.snapshot([a])
+        with open(self.folder / JOURNAL_FILENAME, 'a') as f:
+            f.write('{"op": "status", "na')
+
+        self.assertEqual(SessionJournal(self.folder).restore()[str(a.link)]['status'], 'working')
+
+    def test_compaction(self):
+        a = Entry(self.folder / 'a.pdf')
+        journal = SessionJournal(self.folder, compact_size=2)
+        journal.snapshot([a])
+        journal.record_status(a)
+        self.assertFalse(journal.needs_compaction())
+        a.status = 'done'
+        journal.record_status(a)
+        self.assertTrue(journal.needs_compaction())
+
+        journal.snapshot([a])
+        self.assertFalse(journal.needs_compaction())
+        self.assertEqual((self.folder / JOURNAL_FILENAME).stat().st_size, 0)
+        self.assertEqual(SessionJournal(self.folder).restore()[str(a.link)]['status'], 'done')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,11 @@
+import shutil
+import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
 from src.invoice_parser import pdf_reader
+from src.invoice_parser.invoice_index import InvoiceIndex
 
 TEST_DIR = Path('./tests/inv_test_documents')
 
@@ -10,6 +14,36 @@ class TestPdfReader(unittest.TestCase):
         for f in TEST_DIR.glob('*.*'):
             text = pdf_reader.extract_text(f)
 
+    def test_parse_folder_flags_resend_with_same_name(self):
+        def parse_invoice(filename):
+            return pdf_reader.Invoice(filename, 'ncl', 1000, '900001', None, None)
+
+        folder = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, folder)
+        (folder / 'uploaded').mkdir()
+        (folder / 'uploaded' / 'a.pdf').write_bytes(b'original')
+        (folder / 'a.pdf').write_bytes(b'resent')
+
+        index = InvoiceIndex()
+        with mock.patch.object(pdf_reader, 'parse_invoice', parse_invoice):
+            pdf_reader.index_folder(folder / 'uploaded', index)
+            invoices = pdf_reader.parse_folder(folder, index)
+
+        self.assertEqual([inv.status for inv in invoices], ['duplicate'])
+
+    def test_parse_folder_excludes_exact_paths(self):
+        folder = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, folder)
+        (folder / 'a.pdf').write_bytes(b'a')
+        (folder / 'b.pdf').write_bytes(b'b')
+
+        parse_invoice = lambda filename: pdf_reader.Invoice(filename, 'ncl', 1, '900001', None, None)
+        with mock.patch.object(pdf_reader, 'parse_invoice', parse_invoice):
+            # An invoice restored from 'uploaded' doesn't hide a new file with the same name
+            invoices = pdf_reader.parse_folder(folder, exclude=[str(folder / 'a.pdf'), folder / 'uploaded' / 'b.pdf'])
+
+        self.assertEqual([inv.link.name for inv in invoices], ['b.pdf'])
+
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
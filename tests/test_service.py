@@ -0,0 +1,95 @@
+import json
+import os
+import threading
+import time
+import unittest
+from http.client import HTTPConnection
+
+from src.invoice_parser.service import ParseServer
+
+class TestParseServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ParseServer(('127.0.0.1', 0), workers=2, queue_size=4, max_body_size=1024)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def request(self, method, path, body=None, content_type='application/json'):
+        conn = HTTPConnection(*self.server.server_address)
+        self.addCleanup(conn.close)
+        conn.request(method, path, body, {'Content-Type': content_type})
+        response = conn.getresponse()
+        return response, response.read()
+
+    def parse(self, paths):
+        return self.request('POST', '/parse', json.dumps({'paths': paths}).encode())
+
+    def test_workers_are_started(self):
+        self.assertEqual(len(self.server.pool._processes), 2)
+
+    def test_health(self):
+        response, body = self.request('GET', '/health')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(json.loads(body)['workers'], 2)
+
+    def test_parse_batch(self):
+        response, body = self.parse(['missing_a.pdf', 'missing_b.pdf'])
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader('Content-Type'), 'application/x-ndjson')
+
+        results = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(sorted(r['link'] for r in results), ['missing_a.pdf', 'missing_b.pdf'])
+        self.assertTrue(all(r['status'] == 'error' for r in results))
+
+    def test_invalid_paths(self):
+        response, _ = self.request('POST', '/parse', json.dumps({'paths': 'abc'}).encode())
+        self.assertEqual(response.status, 400)
+        response, _ = self.request('POST', '/parse', json.dumps({'paths': [1]}).encode())
+        self.assertEqual(response.status, 400)
+
+    def test_batch_too_large(self):
+        response, _ = self.parse(['a.pdf'] * 5)
+        self.assertEqual(response.status, 413)
+
+    def test_body_too_large(self):
+        response, _ = self.request('POST', '/parse', b'x' * 2048, 'application/pdf')
+        self.assertEqual(response.status, 413)
+
+    def test_upload_is_removed_after_parsing(self):
+        response, body = self.request('POST', '/parse', b'not a pdf', 'application/pdf')
+        self.assertEqual(response.status, 200)
+
+        upload = json.loads(body)['link']
+        for _ in range(50):
+            if not os.path.exists(upload):
+                break
+            time.sleep(0.01)
+        self.assertFalse(os.path.exists(upload))
+
+    def test_upload_queue_full(self):
+        self.assertTrue(self.server.acquire(4))
+        try:
+            response, _ = self.request('POST', '/parse', b'%PDF', 'application/pdf')
+        finally:
+            self.server.release(4)
+
+        self.assertEqual(response.status, 503)
+
+    def test_queue_full(self):
+        self.assertTrue(self.server.acquire(4))
+        try:
+            response, _ = self.parse(['a.pdf'])
+        finally:
+            self.server.release(4)
+
+        self.assertEqual(response.status, 503)
+        self.assertEqual(response.getheader('Retry-After'), '1')
+
+
+if __name__ == '__main__':
+    unittest.main()
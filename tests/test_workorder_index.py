@@ -0,0 +1,55 @@
+import unittest
+from decimal import Decimal
+from types import SimpleNamespace
+
+from src.invoice_parser.workorder_index import WorkOrderIndex
+
+def make_invoice(workorder, amount, status='success'):
+    return SimpleNamespace(workorder=workorder, amount=Decimal(amount), status=status)
+
+class TestWorkOrderIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = WorkOrderIndex()
+        self.a = make_invoice('900001', '10.00')
+        self.b = make_invoice('900001', '5.50')
+        self.c = make_invoice(None, '1.00', 'missing_wo')
+        self.index.add('a.pdf', self.a)
+        self.index.add('b.pdf', self.b)
+        self.index.add('c.pdf', self.c)
+
+    def test_lookup(self):
+        self.assertEqual(self.index.invoices('900001'), [self.a, self.b])
+        self.assertEqual(self.index.count(None), 1)
+        self.assertEqual(self.index.invoices('unknown'), [])
+
+    def test_totals(self):
+        self.assertEqual(self.index.total('900001'), Decimal('15.50'))
+        self.assertEqual(self.index.status_total('success'), Decimal('15.50'))
+        self.assertEqual(self.index.workorder_status_total(None, 'missing_wo'), Decimal('1.00'))
+
+    def test_update_status(self):
+        self.a.status = 'done'
+        self.index.update('a.pdf', self.a)
+        self.assertEqual(self.index.total('900001'), Decimal('15.50'))
+        self.assertEqual(self.index.status_total('done'), Decimal('10.00'))
+        self.assertEqual(self.index.workorder_status_total('900001', 'success'), Decimal('5.50'))
+
+    def test_remove(self):
+        self.index.remove('a.pdf')
+        self.index.remove('b.pdf')
+        self.assertNotIn('900001', self.index.workorders)
+        self.assertEqual(self.index.total('900001'), Decimal())
+        self.assertEqual(len(self.index), 1)
+
+    def test_clear(self):
+        self.index.clear()
+        self.assertEqual(len(self.index), 0)
+        self.assertEqual(self.index.total('900001'), Decimal())
+        self.assertEqual(self.index.status_total('success'), Decimal())
+
+        self.index.add('a.pdf', self.a)
+        self.assertEqual(self.index.total('900001'), Decimal('10.00'))
+
+
+if __name__ == '__main__':
+    unittest.main()